@@ -1,45 +1,251 @@
 import os
+import sys
+import atexit
 import openai
 import json
+import orjson
 from urllib.parse import urlparse, urljoin
-import time
 import re
+import functools
+import asyncio
+import aiohttp
+from concurrent.futures import ProcessPoolExecutor
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 import undetected_chromedriver as uc
-from bs4 import BeautifulSoup
-import requests
+import lxml.html
+from lxml import etree
+import tiktoken
 from datetime import datetime, timedelta
 import sqlite3  # For database operations
 from newspaper import Article  # Requires: pip install newspaper3k
 
+# Attributes that survive cleaning, per tag: links keep their target, times keep their machine-readable date.
+KEPT_ATTRIBUTES = {"a": "href", "time": "datetime"}
+# Browser-like headers for static fetches; many portals reject the default aiohttp user agent.
+HTTP_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/122.0 Safari/537.36",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+# Static page/article downloads in flight at once (on top of the 4-per-host connection limit).
+FETCH_CONCURRENCY = 16
+# Per-socket timeouts for static fetches; time spent waiting for a pooled connection is not counted.
+FETCH_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=20)
+CORCEL_API_URL = "https://api.corcel.io/v1/chat/completions"
+# Concurrent Corcel requests; keep within the account's RPM/TPM budget.
+LLM_CONCURRENCY = 8
+LLM_MAX_RETRIES = 5
+# Rate limiting and transient server errors worth retrying.
+LLM_RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Next-page links looked up during pagination discovery.
+PAGINATION_LINK_XPATH = '//a[contains(@class, "Pagination-Link") and contains(@href, "page=")]'
+REL_NEXT_XPATH = '//a[@rel="next"]'
+# Substrings showing that statically fetched HTML already contains the server-rendered article list.
+RENDERED_MARKERS = ("Pagination-Link", 'rel="next"', "<article")
+# Pages packed into one LLM request (the batch's maxBatchSize).
+PAGES_PER_REQUEST = 4
+# Input budget for the candidate blocks sent to the LLM per page.
+MAX_PROMPT_TOKENS = 8000
+# Output budget per page in a request; max_tokens grows with the batch, up to gpt-4o's output limit.
+MAX_OUTPUT_TOKENS_PER_PAGE = 4000
+MAX_OUTPUT_TOKENS = 16384
+# Elements that may hold one news teaser; only the outermost match of nested candidates is sent.
+CANDIDATE_XPATH = "//article | //li | //a"
+# Containers that typically hold the article list; everything outside them (nav, header, footer, ads) is skipped.
+CONTENT_XPATH = '//main | //article | //*[contains(@class, "list") or contains(@class, "news")]'
+
+INSERT_NEWS_SQL = """
+INSERT OR IGNORE INTO news (Title, Author, Publication_Date, Link, base_url, paginated_url, created_time)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+# Rows buffered by the streaming writer before each executemany.
+DB_WRITE_BATCH = 50
+
+# Whitespace normalization applied to the serialized cleaned HTML, in one scan:
+# whitespace between tags is dropped, newlines are removed and longer runs collapse to one space.
+_WS = re.compile(r">\s+<|\s*\n\s*|\s{2,}")
+# Markdown article blocks returned by the LLM ("1. **Title**: ...", "- **Link**: ...").
+_BLOCK_SPLIT_RE = re.compile(r"\n(?=\d+\.)")
+_TITLE_RE = re.compile(r"\d+\.\s*\*\*Title\*\*:\s*(.*)")
+_PUB_DATE_RE = re.compile(r"-\s*\*\*Publication Date\*\*:\s*(.*)")
+_AUTHOR_RE = re.compile(r"-\s*\*\*Author\*\*:\s*(.*)")
+_LINK_RE = re.compile(r"-\s*\*\*Link\*\*:\s*(.*)")
+# Leading <?xml ... encoding="..."?> declaration, which lxml rejects in already-decoded str input.
+_XML_DECL_RE = re.compile(r"^\s*<\?xml[^>]*\?>")
+# A non-null finish_reason ("stop", "length", ...) in an SSE chunk, matched on the raw bytes.
+_SSE_FINISH_RE = re.compile(rb'"finish_reason"\s*:\s*"(\w+)"')
+# The delta "content" string of an SSE chat completion chunk, matched on the raw bytes.
+_SSE_CONTENT_RE = re.compile(rb'"content"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+def _outermost(elements):
+    """Filters elements down to those that are not nested inside another element of the same list."""
+    matched = set(elements)
+    return [el for el in elements if not any(anc in matched for anc in el.iterancestors())]
+
+@functools.lru_cache(maxsize=None)
+def _token_encoding():
+    """The gpt-4o tokenizer, loaded on first use."""
+    return tiktoken.encoding_for_model("gpt-4o")
+
+def _strip_code_fence(text):
+    """Removes a surrounding ```json ... ``` fence from LLM output, if present."""
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[len("```json"):].strip()
+        if text.endswith("```"):
+            text = text[:-3].strip()
+    return text
+
+def _parse_article(link_and_html):
+    """
+    Parses one downloaded article with Newspaper3k; runs in a worker process.
+    Returns (text, authors, publish_date) with missing values as None, or the exception raised while parsing.
+    """
+    link, html = link_and_html
+    try:
+        art = Article(link)
+        art.set_html(html)
+        art.parse()
+        authors = ", ".join(art.authors) if art.authors else None
+        publish_date = art.publish_date.isoformat() if art.publish_date else None
+        return art.text, authors, publish_date
+    except Exception as e:
+        return e
+
+def _sse_content(data):
+    """
+    Returns the delta content of one SSE chunk payload (bytes) without decoding the whole envelope.
+    Chunks the regex cannot match (e.g. "content": null) fall back to a full orjson parse; unparseable ones yield "".
+    """
+    match = _SSE_CONTENT_RE.search(data)
+    if match:
+        return orjson.loads(b'"' + match.group(1) + b'"')
+    try:
+        json_line = orjson.loads(data)
+    except orjson.JSONDecodeError:
+        return ""
+    if json_line.get("choices"):
+        return json_line["choices"][0].get("delta", {}).get("content") or ""
+    return ""
+
+def _scalar(value):
+    """Converts an LLM-supplied field to something SQLite can bind: lists are joined, other non-strings str()-ed."""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, list):
+        return ", ".join(str(v) for v in value if v is not None) or None
+    return str(value)
+
+def _news_row(article, base_url, paginated_url, created_time):
+    """
+    Builds the INSERT_NEWS_SQL row for one extracted article, with a relative Link made absolute.
+    Returns None when the article is not a dict or its Title or Link is not a non-empty string.
+    """
+    if not isinstance(article, dict):
+        return None
+    title, link = article.get("Title"), article.get("Link")
+    if not isinstance(title, str) or not title.strip() or not isinstance(link, str) or not link.strip():
+        return None
+    link = link.strip()
+    if not link.startswith("http"):
+        link = urljoin(base_url, link)
+    return (title, _scalar(article.get("Author")), _scalar(article.get("Publication Date")),
+            link, base_url, paginated_url, created_time)
+
+def _collapse_whitespace(match):
+    """Replacement callback for _WS, matching the former three-pass re.sub output."""
+    run = match.group(0)
+    if run[0] == ">":
+        return "><"
+    return " " if run.replace("\n", "") else ""
+
+class _ArticleStreamParser:
+    """
+    Incrementally pulls complete article objects out of a streamed
+    {"results": {"<page id>": [{...}, ...], ...}} response, so articles can be stored
+    before the whole response has arrived.
+    """
+    def __init__(self):
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._key = []
+        self._page_id = ""
+        self._article = []
+
+    def feed(self, chunk):
+        """Consumes the next piece of streamed text and returns the (page_id, article) pairs it completed."""
+        articles = []
+        for ch in chunk:
+            if self._depth >= 4:
+                self._article.append(ch)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                elif self._depth == 2:
+                    self._key.append(ch)
+                continue
+            if ch == '"':
+                self._in_string = True
+                if self._depth == 2:
+                    self._key = []
+            elif ch in "{[":
+                self._depth += 1
+                if self._depth == 3:
+                    self._page_id = "".join(self._key)
+                elif self._depth == 4:
+                    self._article = [ch]
+            elif ch in "}]":
+                if self._depth == 4:
+                    try:
+                        articles.append((self._page_id, orjson.loads("".join(self._article))))
+                    except orjson.JSONDecodeError:
+                        pass
+                self._depth -= 1
+        return articles
+
 class NewsScrapperGeneral:
-    def __init__(self, base_urls):
+    def __init__(self, base_urls, js_rendered_hosts=()):
         """
         Initialize the NewsScrapperGeneral with a list of base URLs.
+        Hosts listed in js_rendered_hosts are known to need JavaScript and are always rendered with Selenium.
         For each base URL, we maintain:
           - paginated_url: a list of discovered URLs (pages)
           - html: a dict mapping each paginated URL to its cleaned HTML
-          - extracted_news: a dict mapping each paginated URL to the raw extracted text (markdown)
+          - extracted_news: a dict mapping each paginated URL to its extracted articles
         """
         self.webpages = [
             {
                 "base_url": url,
                 "paginated_url": [],
                 "html": {},           # {paginated_url: cleaned_html, ...}
-                "extracted_news": {}  # {paginated_url: extracted_text, ...}
+                "extracted_news": {}  # {paginated_url: [article, ...], ...}
             }
             for url in base_urls
         ]
+        # paginated_url of each base URL as a set, for constant-time membership tests;
+        # kept out of self.webpages so that stays JSON-serializable
+        self._seen = {url: set() for url in base_urls}
+        self.js_rendered_hosts = set(js_rendered_hosts)
+        self._driver = None
 
-    def find_all_pagination_urls(self):
-        """
-        Extracts pagination URLs from different webpage structures.
-        Stops after finding 10 additional pages per base URL (total 11 pages).
-        """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _build_opts(self):
+        """Chrome options shared by every Selenium step."""
         options = uc.ChromeOptions()
-        options.headless = False  # Change to True for silent mode
+        options.headless = True  # Change to False to watch the browser
         options.add_argument("--disable-blink-features=AutomationControlled")
         options.add_argument("--no-sandbox")
         options.add_argument("--disable-dev-shm-usage")
@@ -48,13 +254,38 @@ class NewsScrapperGeneral:
         options.add_argument("--log-level=3")
         options.add_argument("--disable-extensions")
         options.add_argument("--disable-infobars")
+        return options
 
-        driver = uc.Chrome(options=options)
+    def _get_driver(self):
+        """
+        Returns the shared undetected_chromedriver instance, starting it on first use.
+        The browser stays open until close() is called (or the interpreter exits).
+        """
+        if self._driver is None:
+            self._driver = uc.Chrome(options=self._build_opts())
+            atexit.register(self.close)
+        return self._driver
+
+    def close(self):
+        """Quits the shared browser, if one was started."""
+        if self._driver is not None:
+            self._driver.quit()
+            self._driver = None
+
+    def find_all_pagination_urls(self):
+        """
+        Extracts pagination URLs from different webpage structures.
+        Stops after finding 10 additional pages per base URL (total 11 pages).
+        """
+        driver = self._get_driver()
         max_pages = 11  # base URL + 10 additional pages
 
         for page in self.webpages:
             current_url = page["base_url"]
-            page["paginated_url"].append(current_url)
+            seen = self._seen[current_url]
+            if current_url not in seen:
+                page["paginated_url"].append(current_url)
+                seen.add(current_url)
             try:
                 driver.get(current_url)
                 wait = WebDriverWait(driver, 5)
@@ -62,152 +293,353 @@ class NewsScrapperGeneral:
                     if len(page["paginated_url"]) >= max_pages:
                         print("🚫 Reached the maximum page limit for", page["base_url"])
                         break
-                    time.sleep(2)
+                    # Wait only until a next link exists (dynamic content), not a fixed delay.
+                    try:
+                        wait.until(EC.any_of(
+                            EC.presence_of_element_located((By.XPATH, PAGINATION_LINK_XPATH)),
+                            EC.presence_of_element_located((By.XPATH, REL_NEXT_XPATH)),
+                        ))
+                    except TimeoutException:
+                        pass
                     next_page_url = None
                     try:
-                        next_button = driver.find_element(By.XPATH, '//a[contains(@class, "Pagination-Link") and contains(@href, "page=")]')
+                        next_button = driver.find_element(By.XPATH, PAGINATION_LINK_XPATH)
                         next_page_url = next_button.get_attribute("href")
                         print("✅ Found 'Next' button:", next_page_url)
                     except:
                         print("❌ No explicit 'Next' button found.")
                     if not next_page_url:
                         try:
-                            next_button = driver.find_element(By.XPATH, '//a[@rel="next"]')
+                            next_button = driver.find_element(By.XPATH, REL_NEXT_XPATH)
                             next_page_url = next_button.get_attribute("href")
                         except:
                             print("❌ No `rel=next` button found.")
                     if next_page_url and not next_page_url.startswith("http"):
                         next_page_url = urljoin(current_url, next_page_url)
-                    if next_page_url and next_page_url not in page["paginated_url"]:
+                    if next_page_url and next_page_url not in seen:
                         print("✅ Next page URL found:", next_page_url)
                         page["paginated_url"].append(next_page_url)
+                        seen.add(next_page_url)
                         driver.get(next_page_url)
                     else:
                         print("🚫 No new next page found, stopping pagination.")
                         break
             except Exception as e:
                 print(f"🔥 Error during pagination search: {e}")
-        driver.quit()
 
     def get_and_clean_html(self):
         """
-        Fetches raw HTML from each paginated URL using undetected_chromedriver,
+        Fetches raw HTML from each paginated URL concurrently over plain HTTP (aiohttp),
+        falling back to undetected_chromedriver for URLs whose static fetch failed, whose static
+        HTML has none of the RENDERED_MARKERS, or whose host is in js_rendered_hosts,
         cleans it, and stores the cleaned HTML in the 'html' dict keyed by the paginated URL.
         """
-        options = uc.ChromeOptions()
-        options.headless = True  
-        options.add_argument("--disable-blink-features=AutomationControlled")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-        driver = uc.Chrome(options=options)
-        try:
-            for page in self.webpages:
-                if page['base_url'] not in page["paginated_url"]:
-                    page["paginated_url"].append(page["base_url"])
-                for single_url in page["paginated_url"]:
+        for page in self.webpages:
+            seen = self._seen[page["base_url"]]
+            if page["base_url"] not in seen:
+                page["paginated_url"].append(page["base_url"])
+                seen.add(page["base_url"])
+        urls = list(dict.fromkeys(url for page in self.webpages for url in page["paginated_url"]))
+
+        static_urls = [url for url in urls if urlparse(url).netloc not in self.js_rendered_hosts]
+        raw_pages = {}
+        for url, result in zip(static_urls, asyncio.run(self._fetch_all(static_urls))):
+            if isinstance(result, Exception):
+                print(f"⚠️ Static fetch failed for {url}, falling back to Selenium: {result}")
+            elif not any(marker in result for marker in RENDERED_MARKERS):
+                print(f"⚠️ Static HTML of {url} looks JS-rendered, falling back to Selenium")
+            else:
+                raw_pages[url] = result
+
+        pending = [url for url in urls if url not in raw_pages]
+        if pending:
+            driver = self._get_driver()
+            for single_url in pending:
+                try:
+                    driver.get(single_url)
+                    raw_pages[single_url] = driver.page_source
+                except Exception as e:
+                    print(f"Failed to fetch {single_url}: {e}")
+
+        for page in self.webpages:
+            for single_url in page["paginated_url"]:
+                if single_url in raw_pages:
                     try:
-                        driver.get(single_url)
-                        raw_html = driver.page_source
-                    except Exception as e:
-                        print(f"Failed to fetch {single_url}: {e}")
-                        continue
-                    soup = BeautifulSoup(raw_html, "html.parser")
-                    for tag in soup(["script", "style", "noscript", "iframe", "svg", "path", "object",
-                                      "embed", "picture", "video", "audio", "source", "input",
-                                      "ins", "del", "form", "button"]):
-                        tag.decompose()
-                    for tag in soup.find_all():
-                        if not tag.get_text(strip=True):
-                            tag.decompose()
-                    for tag in soup.find_all(True):
-                        attrs_to_remove = ["class", "id", "role", "data-*", "aria-*", "onclick", "onload", "style"]
-                        for attr in list(tag.attrs):
-                            if tag.name == "a" and attr == "href":
-                                continue
-                            if any(re.match(pattern.replace("*", ".*"), attr) for pattern in attrs_to_remove):
-                                del tag[attr]
-                    cleaned_html = str(soup)
-                    cleaned_html = re.sub(r">\s+<", "><", cleaned_html)
-                    cleaned_html = re.sub(r"\n+", "", cleaned_html)
-                    cleaned_html = re.sub(r"\s{2,}", " ", cleaned_html)
-                    page["html"][single_url] = cleaned_html
-        finally:
-            driver.quit()
+                        page["html"][single_url] = self._clean_html(raw_pages[single_url])
+                    except (ValueError, etree.ParserError) as e:
+                        print(f"Failed to parse {single_url}: {e}")
 
-    def extract_news_articles_with_chatgpt(self):
+    async def _fetch(self, session, semaphore, url):
+        """Fetches one URL and returns its body, raising on HTTP errors."""
+        async with semaphore:
+            async with session.get(url, timeout=FETCH_TIMEOUT) as response:
+                response.raise_for_status()
+                return await response.text()
+
+    async def _fetch_all(self, urls):
+        """
+        Fetches all URLs concurrently, at most FETCH_CONCURRENCY at a time and 4 connections per host.
+        Returns one entry per URL, either the page body or the exception raised while fetching it.
+        """
+        semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+        connector = aiohttp.TCPConnector(limit_per_host=4)
+        async with aiohttp.ClientSession(connector=connector, headers=HTTP_HEADERS) as session:
+            return await asyncio.gather(*[self._fetch(session, semaphore, url) for url in urls], return_exceptions=True)
+
+    def _clean_html(self, raw_html):
+        """
+        Cleans raw HTML in a single lxml pass: keeps only the outermost content containers
+        matched by CONTENT_XPATH (or the whole page if none match), drops non-content elements,
+        comments and text-less elements, strips every attribute except those in KEPT_ATTRIBUTES
+        and collapses whitespace in the serialized output.
+        Raises ValueError / etree.ParserError for documents lxml cannot parse (e.g. empty ones).
+        """
+        tree = lxml.html.fromstring(_XML_DECL_RE.sub("", raw_html, count=1))
+        containers = _outermost(tree.xpath(CONTENT_XPATH))
+        if containers:
+            tree = lxml.html.Element("div")
+            tree.extend(containers)
+        etree.strip_elements(tree, etree.Comment, "script", "style", "noscript", "iframe", "svg", "path",
+                             "object", "embed", "picture", "video", "audio", "source", "input",
+                             "ins", "del", "form", "button", with_tail=False)
+        for el in tree.xpath("//*[not(normalize-space())]"):
+            if el.getparent() is not None:
+                el.drop_tree()
+        for el in tree.xpath("descendant-or-self::*[@*]"):
+            kept_attr = KEPT_ATTRIBUTES.get(el.tag)
+            kept_value = el.get(kept_attr) if kept_attr else None
+            el.attrib.clear()
+            if kept_value is not None:
+                el.set(kept_attr, kept_value)
+        cleaned_html = lxml.html.tostring(tree, encoding="unicode")
+        return _WS.sub(_collapse_whitespace, cleaned_html)
+
+    def _candidate_blocks(self, html_content, max_tokens=MAX_PROMPT_TOKENS):
+        """
+        Reduces cleaned HTML to the outermost candidate article blocks (CANDIDATE_XPATH), each as
+        {"html": snippet, "text": visible text}, in page order and bounded to max_tokens gpt-4o tokens.
+        Blocks are never cut in half; the first block that would exceed the budget ends the list.
+        """
+        tree = lxml.html.fromstring(html_content)
+        encoding = _token_encoding()
+        blocks = []
+        used_tokens = 0
+        for el in _outermost(tree.xpath(CANDIDATE_XPATH)) or [tree]:
+            text = " ".join(el.text_content().split())
+            if not text:
+                continue
+            block = {"html": lxml.html.tostring(el, encoding="unicode", with_tail=False), "text": text}
+            block_tokens = len(encoding.encode(json.dumps(block, ensure_ascii=False)))
+            if used_tokens + block_tokens > max_tokens:
+                break
+            blocks.append(block)
+            used_tokens += block_tokens
+        return blocks
+
+    def extract_news_articles_with_chatgpt(self, db_path=None):
         """
         For each cleaned HTML (keyed by URL in the 'html' dict),
         uses the Corcel API to extract news article information.
-        The extracted markdown is accumulated per URL and stored in the 'extracted_news' dict.
+        Up to PAGES_PER_REQUEST pages are packed into one request, and all requests are sent
+        concurrently, at most LLM_CONCURRENCY at a time.
+        The extracted articles (a list of dicts, or "" on failure) are stored per URL in the 'extracted_news' dict.
+        If db_path is given, each article is also inserted into the 'news' table as soon as it has
+        been streamed, while the responses are still arriving (same rows as save_to_db).
+        The API key is read from the CORCEL_API_KEY environment variable.
         """
-        CORCEL_API_KEY = {CORCEL_API_KEY}
+        corcel_api_key = os.environ.get("CORCEL_API_KEY")
+        if not corcel_api_key:
+            raise RuntimeError("CORCEL_API_KEY environment variable is not set")
+        asyncio.run(self._extract_all(corcel_api_key, db_path))
+
+    async def _extract_all(self, corcel_api_key, db_path=None):
+        """Groups the cleaned HTML pages into batches, dispatches one Corcel request per batch and gathers the results."""
+        headers = {
+            "Authorization": f"Bearer {corcel_api_key}",
+            "Content-Type": "application/json"
+        }
+        jobs = []
         for page in self.webpages:
             for url_key, html_content in page["html"].items():
                 if not isinstance(html_content, str):
                     print("Skipping non-string content for URL:", url_key)
                     continue
-                raw_html = html_content[:100000]
-                parsed_url = urlparse(page["base_url"])
-                base_url = f"{parsed_url.scheme}://{parsed_url.netloc}/"
-                prompt = f"""
-                You are an AI that extracts structured data from raw HTML of a news portal.
-                Extract the following details for each news article:
-                - **Title**: the title of the article.
-                - **Publication Date**: If no date is explicitly given, return null.
-                - **Author**: the name(s) of the author(s).
-                - **Link**: the article’s hyperlink (if relative, return as-is).
-                Extract this from the following HTML:
-                ```html
-                {raw_html}
-                ```
-                """
-                try:
-                    api_url = "https://api.corcel.io/v1/chat/completions"
-                    payload = {
-                        "model": "gpt-4o",
-                        "messages": [{"role": "system", "content": prompt}],
-                        "temperature": 0.1,
-                        "max_tokens": 10000,
-                        "stream": True
-                    }
-                    headers = {
-                        "Authorization": f"Bearer {CORCEL_API_KEY}",
-                        "Content-Type": "application/json"
-                    }
-                    response = requests.post(api_url, json=payload, headers=headers, stream=True)
-                    extracted_text = ""
-                    if response.status_code == 200:
-                        for line in response.iter_lines():
-                            if line:
-                                try:
-                                    json_line = json.loads(line.decode("utf-8").replace("data: ", ""))
-                                    if "choices" in json_line and json_line["choices"]:
-                                        extracted_text += json_line["choices"][0]["delta"].get("content", "")
-                                except json.JSONDecodeError:
+                jobs.append((page, url_key, html_content))
+        batches = [jobs[i:i + PAGES_PER_REQUEST] for i in range(0, len(jobs), PAGES_PER_REQUEST)]
+
+        queue = None
+        if db_path:
+            queue = asyncio.Queue()
+            writer = asyncio.create_task(self._write_articles(queue, db_path))
+        semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+        timeout = aiohttp.ClientTimeout(total=600)
+        # One pooled keep-alive connection per concurrent request, reused by every batch of the run.
+        connector = aiohttp.TCPConnector(limit=LLM_CONCURRENCY, keepalive_timeout=60)
+        try:
+            async with aiohttp.ClientSession(connector=connector, headers=headers, timeout=timeout) as session:
+                results = await asyncio.gather(*[
+                    self._extract_batch(session, semaphore, batch, queue) for batch in batches
+                ])
+        finally:
+            if queue is not None:
+                await queue.put(None)
+                await writer
+        for batch, batch_results in zip(batches, results):
+            for (page, url_key, _), articles in zip(batch, batch_results):
+                page["extracted_news"][url_key] = articles
+
+    async def _extract_batch(self, session, semaphore, batch, queue=None):
+        """
+        Streams the Corcel extraction for a batch of (page, url_key, html_content) jobs.
+        Each page is sent as its candidate article blocks (see _candidate_blocks) under its index
+        in the batch, and the model answers with a JSON object keyed by that index.
+        Returns one entry per job: the page's list of article dicts, or "" if nothing was extracted.
+        If a queue is given, every article is put on it as (page, url_key, article) as soon as
+        its JSON object is complete in the stream.
+        Responses with a status in LLM_RETRY_STATUSES are retried with exponential backoff
+        (or the server's Retry-After); any other failure is reported and yields "" for every page of the batch.
+        max_tokens scales with the batch size; if the answer is cut off (finish_reason "length") and cannot
+        be parsed, the articles already completed in the stream are returned, grouped by page.
+        """
+        url_keys = [url_key for _, url_key, _ in batch]
+        parts = []
+        stream_parser = _ArticleStreamParser()
+        streamed = {}  # {page id: [article, ...]} completed in the stream, used if the full answer is cut off
+        finish_reason = None
+        try:
+            pages = json.dumps(
+                {"pages": [{"id": i, "blocks": self._candidate_blocks(html_content)}
+                           for i, (_, _, html_content) in enumerate(batch)]},
+                ensure_ascii=False
+            )
+            prompt = f"""
+            You are an AI that extracts structured data from news portal pages.
+            The pages are given as JSON; each page has an "id" and a list of candidate blocks,
+            each block with its HTML snippet and visible text.
+            Extract the following details for each news article:
+            - **Title**: the title of the article.
+            - **Publication Date**: If no date is explicitly given, return null.
+            - **Author**: the name(s) of the author(s).
+            - **Link**: the article’s hyperlink (if relative, return as-is).
+            Answer with a JSON object only, mapping each page id to the list of its articles:
+            {{"results": {{"0": [{{"Title": ..., "Publication Date": ..., "Author": ..., "Link": ...}}], "1": [...]}}}}
+            Extract this from the following pages:
+            ```json
+            {pages}
+            ```
+            """
+            payload = {
+                "model": "gpt-4o",
+                "messages": [{"role": "system", "content": prompt}],
+                "temperature": 0.1,
+                "max_tokens": min(MAX_OUTPUT_TOKENS_PER_PAGE * len(batch), MAX_OUTPUT_TOKENS),
+                "stream": True,
+                "response_format": {"type": "json_object"}
+            }
+            for attempt in range(LLM_MAX_RETRIES):
+                async with semaphore:
+                    async with session.post(CORCEL_API_URL, json=payload) as response:
+                        if response.status == 200:
+                            async for line in response.content:
+                                line = line.strip()
+                                if not line.startswith(b"data: "):
                                     continue
-                        print(f"Extracted text for {url_key}:\n{extracted_text}\n")
-                    else:
-                        print(f"API error for {url_key}: {response.status_code}, {response.text}")
-                except Exception as e:
-                    print(f"Error processing content with ChatGPT for {url_key}: {e}")
-                page["extracted_news"][url_key] = extracted_text.strip()
+                                data = line[6:]
+                                if data == b"[DONE]":
+                                    break
+                                finish = _SSE_FINISH_RE.search(data)
+                                if finish:
+                                    finish_reason = finish.group(1).decode()
+                                content = _sse_content(data)
+                                if content:
+                                    parts.append(content)
+                                    for page_id, article in stream_parser.feed(content):
+                                        if page_id.isdigit() and int(page_id) < len(batch) and isinstance(article, dict):
+                                            streamed.setdefault(page_id, []).append(article)
+                                            if queue is not None:
+                                                page, url_key, _ = batch[int(page_id)]
+                                                queue.put_nowait((page, url_key, article))
+                            print(f"Extracted text for {', '.join(url_keys)}:\n{''.join(parts)}\n")
+                            if finish_reason != "stop":
+                                print(f"⚠️ Response for {', '.join(url_keys)} ended with finish_reason={finish_reason}")
+                            break
+                        if response.status not in LLM_RETRY_STATUSES or attempt == LLM_MAX_RETRIES - 1:
+                            print(f"API error for {', '.join(url_keys)}: {response.status}, {await response.text()}")
+                            break
+                        retry_after = response.headers.get("Retry-After", "")
+                        delay = int(retry_after) if retry_after.isdigit() else 2 ** attempt
+                print(f"⏳ HTTP {response.status} for {', '.join(url_keys)}, retrying in {delay}s")
+                await asyncio.sleep(delay)
+        except Exception as e:
+            print(f"Error processing content with ChatGPT for {', '.join(url_keys)}: {e}")
+
+        extracted_text = "".join(parts).strip()
+        if not extracted_text:
+            return [""] * len(batch)
+        try:
+            results = orjson.loads(_strip_code_fence(extracted_text))["results"]
+        except (orjson.JSONDecodeError, KeyError, TypeError) as e:
+            print(f"⚠️ Error decoding batched JSON for {', '.join(url_keys)}: {e}")
+            if streamed:
+                print(f"↩️ Using the {sum(map(len, streamed.values()))} articles completed in the stream")
+            return [streamed.get(str(i)) or "" for i in range(len(batch))]
+        if not isinstance(results, dict):
+            print(f"⚠️ Unexpected 'results' type {type(results).__name__} for {', '.join(url_keys)}")
+            return [""] * len(batch)
+        extracted = []
+        for i, url_key in enumerate(url_keys):
+            articles = results.get(str(i))
+            if not isinstance(articles, list) or not all(isinstance(a, dict) for a in articles):
+                if articles:
+                    print(f"⚠️ Unexpected article list for {url_key}, skipping")
+                articles = ""
+            extracted.append(articles or "")
+        return extracted
+
+    async def _write_articles(self, queue, db_path):
+        """
+        Consumes (page, paginated_url, article) items from the queue until a None sentinel and
+        inserts them into the 'news' table, DB_WRITE_BATCH rows per executemany.
+        Articles are validated, their fields converted to scalars and their links made absolute (see _news_row).
+        """
+        conn = self._connect(db_path)
+        c = conn.cursor()
+        self._create_schema(c)
+        conn.commit()
+        created_time = datetime.now().isoformat()
+        rows = []
+        while True:
+            item = await queue.get()
+            if item is not None:
+                page, paginated_url, article = item
+                row = _news_row(article, page["base_url"], paginated_url, created_time)
+                if row:
+                    rows.append(row)
+            if rows and (item is None or len(rows) >= DB_WRITE_BATCH):
+                c.executemany(INSERT_NEWS_SQL, rows)
+                conn.commit()
+                rows = []
+            if item is None:
+                break
+        conn.close()
+        print("✅ Streamed articles saved to SQLite database:", db_path)
 
     def flatten_news(self):
         """
-        Processes the extracted markdown text for each URL in 'extracted_news'
-        and converts it into a list of article dictionaries.
+        Processes the extracted data for each URL in 'extracted_news' (an article list,
+        or markdown/JSON text) and converts it into a list of article dictionaries.
         The final structure for each page's extracted_news is a dict mapping each URL
         to a list of article dicts.
         Articles with a missing or empty Link are dropped, and relative links are converted to absolute.
         """
         def convert_markdown_to_articles(markdown_text):
-            blocks = re.split(r"\n(?=\d+\.)", markdown_text.strip())
+            blocks = _BLOCK_SPLIT_RE.split(markdown_text.strip())
             articles = []
             for block in blocks:
-                title_match = re.search(r"\d+\.\s*\*\*Title\*\*:\s*(.*)", block)
-                pub_date_match = re.search(r"-\s*\*\*Publication Date\*\*:\s*(.*)", block)
-                author_match = re.search(r"-\s*\*\*Author\*\*:\s*(.*)", block)
-                link_match = re.search(r"-\s*\*\*Link\*\*:\s*(.*)", block)
+                title_match = _TITLE_RE.search(block)
+                pub_date_match = _PUB_DATE_RE.search(block)
+                author_match = _AUTHOR_RE.search(block)
+                link_match = _LINK_RE.search(block)
                 if title_match and link_match:
                     article = {}
                     article["Title"] = title_match.group(1).strip()
@@ -219,16 +651,16 @@ class NewsScrapperGeneral:
             return articles
 
         for page in self.webpages:
+            base_url = page.get("base_url", "")
             new_extracted = {}
             for url_key, news_data in page.get("extracted_news", {}).items():
                 if not news_data:
                     continue
-                news_data = news_data.strip()
-                if news_data.startswith("```json"):
-                    news_data = news_data[len("```json"):].strip()
-                    if news_data.endswith("```"):
-                        news_data = news_data[:-3].strip()
-                if not news_data.startswith("[") and not news_data.startswith("{"):
+                if isinstance(news_data, str):
+                    news_data = _strip_code_fence(news_data)
+                if isinstance(news_data, list):
+                    articles = news_data
+                elif not news_data.startswith("[") and not news_data.startswith("{"):
                     articles = convert_markdown_to_articles(news_data)
                 else:
                     try:
@@ -237,12 +669,18 @@ class NewsScrapperGeneral:
                         print(f"⚠️ Error decoding JSON from extracted_news for {url_key}: {e}")
                         print(f"Problematic content:\n{news_data}")
                         continue
-                base_url = page.get("base_url", "")
+                if isinstance(articles, dict):
+                    articles = [articles]
+                elif not isinstance(articles, list):
+                    articles = []
                 valid_articles = []
                 for article in articles:
-                    link = article.get("Link", "").strip()
-                    if not link:
+                    if not isinstance(article, dict):
+                        continue
+                    link = article.get("Link")
+                    if not isinstance(link, str) or not link.strip():
                         continue
+                    link = link.strip()
                     if not link.startswith("http"):
                         article["Link"] = urljoin(base_url, link)
                     valid_articles.append(article)
@@ -250,22 +688,15 @@ class NewsScrapperGeneral:
                 print(f"✅ Successfully flattened {len(valid_articles)} articles for {url_key}")
             page["extracted_news"] = new_extracted
 
-    def save_to_db(self, db_path="news.db"):
-        """
-        Saves the extracted news data into a SQLite database table called 'news'.
-        The table has the following schema:
-            - Title (TEXT PRIMARY KEY)
-            - Author (TEXT, nullable)
-            - Publication_Date (TEXT, nullable)
-            - Link (TEXT NOT NULL)
-            - base_url (TEXT NOT NULL)
-            - paginated_url (TEXT NOT NULL)
-            - created_time (TEXT NOT NULL)
-            - article (TEXT, nullable)
-        Data is saved for each article from each paginated URL.
-        """
+    def _connect(self, db_path):
+        """Opens the SQLite database in WAL mode with relaxed fsync, suited to bulk writes."""
         conn = sqlite3.connect(db_path)
-        c = conn.cursor()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _create_schema(self, c):
+        """Creates the 'news' table (see save_to_db) and its pending-details index if missing."""
         create_table_sql = """
         CREATE TABLE IF NOT EXISTS news (
             Title TEXT PRIMARY KEY,
@@ -279,23 +710,40 @@ class NewsScrapperGeneral:
         );
         """
         c.execute(create_table_sql)
+        # Partial index over the rows update_article_details still has to fill in.
+        c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_news_pending ON news(Title)
+        WHERE article IS NULL OR Author IS NULL OR Publication_Date IS NULL;
+        """)
+
+    def save_to_db(self, db_path="news.db"):
+        """
+        Saves the extracted news data into a SQLite database table called 'news'.
+        The table has the following schema:
+            - Title (TEXT PRIMARY KEY)
+            - Author (TEXT, nullable)
+            - Publication_Date (TEXT, nullable)
+            - Link (TEXT NOT NULL)
+            - base_url (TEXT NOT NULL)
+            - paginated_url (TEXT NOT NULL)
+            - created_time (TEXT NOT NULL)
+            - article (TEXT, nullable)
+        Data is saved for each article from each paginated URL, in a single executemany transaction;
+        articles without a usable Title/Link are skipped and other fields are converted to scalars (see _news_row).
+        """
+        conn = self._connect(db_path)
+        c = conn.cursor()
+        self._create_schema(c)
         conn.commit()
         created_time = datetime.now().isoformat()
-        for page in self.webpages:
-            base_url = page.get("base_url")
-            for paginated_url, articles in page.get("extracted_news", {}).items():
-                for article in articles:
-                    title = article.get("Title")
-                    author = article.get("Author")
-                    pub_date = article.get("Publication Date")
-                    link = article.get("Link")
-                    if not (title and link and base_url and paginated_url):
-                        continue
-                    insert_sql = """
-                    INSERT OR IGNORE INTO news (Title, Author, Publication_Date, Link, base_url, paginated_url, created_time)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """
-                    c.execute(insert_sql, (title, author, pub_date, link, base_url, paginated_url, created_time))
+        rows = [
+            row
+            for page in self.webpages if page.get("base_url")
+            for paginated_url, articles in page.get("extracted_news", {}).items() if paginated_url
+            for article in articles
+            for row in [_news_row(article, page["base_url"], paginated_url, created_time)] if row
+        ]
+        c.executemany(INSERT_NEWS_SQL, rows)
         conn.commit()
         conn.close()
         print("✅ Data saved to SQLite database:", db_path)
@@ -304,52 +752,61 @@ class NewsScrapperGeneral:
         """
         For each record in the 'news' table where the article text, Author, or Publication_Date is NULL,
         scrape the main article text from the Link using Newspaper3k, and update the record.
+        All links are downloaded concurrently first; Newspaper3k then parses the fetched HTML
+        across all CPU cores in a process pool.
         The scraped main text is saved under the 'article' column, and if Author or Publication_Date
-        are missing, they are updated as well.
+        are missing, they are updated as well. All updates are written with one executemany.
         """
-        conn = sqlite3.connect(db_path)
+        conn = self._connect(db_path)
         c = conn.cursor()
-        c.execute("PRAGMA table_info(news);")
-        columns = [col[1] for col in c.fetchall()]
-        if "article" not in columns:
-            try:
-                c.execute("ALTER TABLE news ADD COLUMN article TEXT;")
-            except Exception as e:
-                print("Error adding column 'article':", e)
-        conn.commit()
         c.execute("SELECT Title, Link, Author, Publication_Date FROM news WHERE article IS NULL OR Author IS NULL OR Publication_Date IS NULL;")
         rows = c.fetchall()
+        links = list(dict.fromkeys(row[1] for row in rows))
+        downloads = dict(zip(links, asyncio.run(self._fetch_all(links))))
+        fetched = [(link, html) for link, html in downloads.items() if not isinstance(html, Exception)]
+        with ProcessPoolExecutor() as executor:
+            parsed = dict(zip((link for link, _ in fetched), executor.map(_parse_article, fetched, chunksize=8)))
+        updates = []
         for row in rows:
             title, link, db_author, db_pub_date = row
             try:
-                art = Article(link)
-                art.download()
-                art.parse()
-                main_text = art.text
-                scraped_author = ", ".join(art.authors) if art.authors else db_author
-                scraped_pub_date = art.publish_date.isoformat() if art.publish_date else db_pub_date
-                update_sql = """
-                UPDATE news 
-                SET article = ?, Author = COALESCE(?, Author),
-                    Publication_Date = COALESCE(?, Publication_Date)
-                WHERE Title = ?;
-                """
-                c.execute(update_sql, (main_text, scraped_author, scraped_pub_date, title))
+                result = parsed.get(link, downloads[link])
+                if isinstance(result, Exception):
+                    raise result
+                main_text, authors, publish_date = result
+                scraped_author = authors or db_author
+                scraped_pub_date = publish_date or db_pub_date
+                updates.append((main_text, scraped_author, scraped_pub_date, title))
                 print(f"Updated details for article: {title}")
             except Exception as e:
                 print(f"Error scraping article at {link}: {e}")
+        update_sql = """
+        UPDATE news 
+        SET article = ?, Author = COALESCE(?, Author),
+            Publication_Date = COALESCE(?, Publication_Date)
+        WHERE Title = ?;
+        """
+        c.executemany(update_sql, updates)
         conn.commit()
         conn.close()
         print("✅ Article details updated in the database.")
 
 
 if __name__ == "__main__":
+    try:
+        from dotenv import load_dotenv  # optional: read the key from a local .env file
+        load_dotenv()
+    except ImportError:
+        pass
+    # Fail before pagination, Chrome and page fetches rather than at the LLM step.
+    if not os.environ.get("CORCEL_API_KEY"):
+        sys.exit("CORCEL_API_KEY not set")
+
     base_url = {baseURL_list}
-    scrapper = NewsScrapperGeneral(base_url)
-    scrapper.find_all_pagination_urls()
-    scrapper.get_and_clean_html()
-    scrapper.extract_news_articles_with_chatgpt()
-    scrapper.flatten_news()
-    scrapper.save_to_db()
-    scrapper.update_article_details()
+    with NewsScrapperGeneral(base_url) as scrapper:
+        scrapper.find_all_pagination_urls()
+        scrapper.get_and_clean_html()
+        scrapper.extract_news_articles_with_chatgpt(db_path="news.db")  # rows are saved while streaming
+        scrapper.flatten_news()
+        scrapper.update_article_details()
 
@@ -1,55 +1,103 @@
-import json
+import os
+import sys
+import itertools
+import orjson
+import hashlib
 import sqlite3
+import asyncio
+import aiohttp
 import requests
-from pydantic import BaseModel, Field
-from typing import List
-from urllib.parse import urljoin
-import time
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-import undetected_chromedriver as uc
-
-# Define the Pydantic model for extraction response
-class ArticleExtractionResponse(BaseModel):
-    keywords: List[str] = Field(..., description="Keywords extracted from the article.")
-    main_category: str = Field(..., description="The main category of the article.")
-    subcategories: List[str] = Field(..., description="A list of subcategories the article belongs to.")
-    summary: str = Field(..., description="A brief summary of the article in a personal blogger's style.")
+from concurrent.futures import ProcessPoolExecutor
+import msgspec
+from typing import List, Optional, Union
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
+
+# Define the msgspec struct for extraction response (JSON decoding and validation in one pass)
+class ArticleExtractionResponse(msgspec.Struct):
+    keywords: List[str]  # Keywords extracted from the article.
+    main_category: str  # The main category of the article.
+    subcategories: List[str]  # A list of subcategories the article belongs to.
+    summary: str  # A brief summary of the article in a personal blogger's style.
+
+# API statuses worth retrying: rate limiting and temporary server failures.
+TRANSIENT_STATUSES = {429, 500, 502, 503, 504}
+
+class TransientError(Exception):
+    """A retryable API failure; retry_after holds the server's Retry-After in seconds, if any."""
+    def __init__(self, message: str, retry_after: Optional[int] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class PermanentError(Exception):
+    """An API failure that retrying will not fix."""
+
+_exponential_wait = wait_exponential(multiplier=1, max=60)
+
+def _wait_retry_after(retry_state) -> float:
+    """Wait as long as the server's Retry-After asks for, else back off exponentially."""
+    exc = retry_state.outcome.exception()
+    if isinstance(exc, TransientError) and exc.retry_after is not None:
+        return exc.retry_after
+    return _exponential_wait(retry_state)
 
 class ArticleExtractor:
-    def __init__(self, db_path: str, corcel_api_key: str):
+    # Article text sent to the LLM is clipped to this many characters (~6k tokens), plenty for classification and a summary.
+    MAX_CHARS = 24_000
+    # Part of the llm_cache key; bump whenever the prompt or schema changes so stale answers are not reused.
+    PROMPT_VER = "1"
+    # Allowed main categories, in prompt order; anything else the model returns maps to FALLBACK_CATEGORY.
+    MAIN_CATEGORIES = (
+        "New Smart Home Devices",
+        "Smart Home Protocols and Standards",
+        "Smart Device Installation and Setup",
+        "Home Automation and Ecosystem Integration",
+        "Energy Efficiency and Sustainability",
+        "IoT Security and Privacy",
+        "Emerging Technologies and Trends",
+        "Troubleshooting and Maintenance",
+        "Lifestyle Applications of Smart Homes",
+        "Developer and Industry News",
+    )
+    ALLOWED_CATS = frozenset(MAIN_CATEGORIES)
+    # Batch API statuses after which a batch's unprocessed articles may be submitted again.
+    BATCH_FINISHED_STATUSES = ("completed", "failed", "expired", "cancelled")
+    FALLBACK_CATEGORY = "Emerging Technologies and Trends"
+
+    def __init__(self, db_path: str, corcel_api_key: Union[str, List[str]], max_concurrency: int = 20, batch_size: int = 100):
         """
-        Initialize with the path to the SQLite database and the Corcel API key.
+        Initialize with the path to the SQLite database and the Corcel API key, or a list of keys
+        that requests rotate through round-robin to spread the per-key rate limits.
+        max_concurrency bounds the number of LLM requests in flight at once;
+        batch_size is the number of extracted rows written per UPDATE transaction.
         """
         self.db_path = db_path
-        self.corcel_api_key = corcel_api_key
-        self.api_url = "https://api.corcel.io/v1/chat/completions"
+        self.api_keys = [corcel_api_key] if isinstance(corcel_api_key, str) else list(corcel_api_key)
+        self.corcel_api_key = self.api_keys[0]
+        self._api_key_cycle = itertools.cycle(self.api_keys)
+        self.max_concurrency = max_concurrency
+        self.batch_size = batch_size
+        self._pending = []
+        self._pending_cache = []
+        self.api_base = "https://api.corcel.io/v1"
+        self.api_url = f"{self.api_base}/chat/completions"
 
         # ✅ Improved system prompt for strict JSON format
-        self.system_prompt = """
+        # Category list and fallback come from MAIN_CATEGORIES / FALLBACK_CATEGORY so they cannot drift from the schema.
+        categories = "\n            ".join(f'{i}. "{category}"' for i, category in enumerate(self.MAIN_CATEGORIES, 1))
+        self.system_prompt = f"""
             You are an AI assistant for article classification and extraction. Your task is to analyze an article and extract structured information, ensuring that the extracted data **strictly** follows the provided JSON schema. 
 
             📌 **Guidelines:**
             - **Keywords:** Extract relevant terms from the article.
             - **Main Category:** Select **ONLY** from the following categories:
-            1. "New Smart Home Devices"
-            2. "Smart Home Protocols and Standards"
-            3. "Smart Device Installation and Setup"
-            4. "Home Automation and Ecosystem Integration"
-            5. "Energy Efficiency and Sustainability"
-            6. "IoT Security and Privacy"
-            7. "Emerging Technologies and Trends"
-            8. "Troubleshooting and Maintenance"
-            9. "Lifestyle Applications of Smart Homes"
-            10. "Developer and Industry News"
+            {categories}
             - **Subcategories:** Select relevant subcategories from the predefined list.
             - **Summary:** Write a personal-blogger-style summary that explains the **main idea** and **significance** of the article in an engaging way.
             
             ❌ **Strict Rules:**
             - The `main_category` **must be one of the provided categories**.
             - If an article seems to belong to a broader topic like "Technology," **map it to the closest relevant category** from the list above.
-            - If the main category **does not match any of the predefined categories**, choose `"Emerging Technologies and Trends"` as a fallback.
+            - If the main category **does not match any of the predefined categories**, choose `"{self.FALLBACK_CATEGORY}"` as a fallback.
         """
 
         self.response_format = {
@@ -65,18 +113,7 @@ class ArticleExtractor:
                     "main_category": {
                         "type": "string",
                         "description": "The main category of the article.",
-                        "enum": [
-                            "New Smart Home Devices",
-                            "Smart Home Protocols and Standards",
-                            "Smart Device Installation and Setup",
-                            "Home Automation and Ecosystem Integration",
-                            "Energy Efficiency and Sustainability",
-                            "IoT Security and Privacy",
-                            "Emerging Technologies and Trends",
-                            "Troubleshooting and Maintenance",
-                            "Lifestyle Applications of Smart Homes",
-                            "Developer and Industry News"
-                        ]
+                        "enum": list(self.MAIN_CATEGORIES)
                     },
                     "subcategories": {
                         "type": "array",
@@ -93,13 +130,32 @@ class ArticleExtractor:
             }
         }
 
-        # Connect to the SQLite database.
-        self.conn = sqlite3.connect(self.db_path)
+        # Constant part of every request; only the messages change per article.
+        self._payload_template = {
+            "model": "gpt-4o",
+            "temperature": 0.1,
+            "max_tokens": 800,
+            "stream": False,
+            "response_format": {"type": "json_schema", "json_schema": self.response_format}
+        }
+
+        # Connect to the SQLite database in autocommit mode; batched writes open their own transactions.
+        # The generous timeout lets parallel shard workers wait for each other's write locks.
+        self.conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False, isolation_level=None)
         self.conn.row_factory = sqlite3.Row
+        # Write-throughput settings: WAL journal, fsync only at checkpoints, in-memory temp tables, ~200 MB page cache.
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        self.conn.execute("PRAGMA cache_size=-200000")
         self._ensure_columns_exist()
+        # Separate connection for the lazy load_articles cursor, so batched writes on self.conn never
+        # run inside its open SELECT; under WAL the cursor keeps a stable snapshot while they commit.
+        self._read_conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._read_conn.row_factory = sqlite3.Row
 
     def _ensure_columns_exist(self):
-        """Ensure required columns exist in the database."""
+        """Ensure required columns, indexes and the llm_cache and batches tables exist in the database."""
         cursor = self.conn.cursor()
         cursor.execute("PRAGMA table_info(news)")
         columns = [row["name"] for row in cursor.fetchall()]
@@ -108,69 +164,80 @@ class ArticleExtractor:
         for col in ["keywords", "main_category", "subcategories", "summary"]:
             if col not in columns:
                 cursor.execute(f"ALTER TABLE news ADD COLUMN {col} TEXT")
-        self.conn.commit()
 
-    def _call_llm(self, article_text: str) -> ArticleExtractionResponse:
-        """
-        Call the Corcel API (using streaming) with the GPT-4o model and return the parsed extraction response.
-        """
-        messages = [
-            {"role": "system", "content": self.system_prompt},
-            {"role": "user", "content": article_text},
-        ]
-        response_format_payload = {"type": "json_schema", "json_schema": self.response_format}
-        payload = {
-            "model": "gpt-4o",
-            "messages": messages,
-            "temperature": 0.1,
-            "max_tokens": 10000,
-            "stream": True,
-            "response_format": response_format_payload
-        }
-        headers = {
-            "Authorization": f"Bearer {self.corcel_api_key}",
-            "Content-Type": "application/json"
-        }
+        # processed_at marks fully processed articles; backfill rows that were completed before it existed
+        if "processed_at" not in columns:
+            cursor.execute("ALTER TABLE news ADD COLUMN processed_at INTEGER")
+            cursor.execute("""
+                UPDATE news SET processed_at = strftime('%s', 'now')
+                WHERE summary IS NOT NULL AND keywords IS NOT NULL AND main_category IS NOT NULL AND subcategories IS NOT NULL
+            """)
 
-        response = requests.post(self.api_url, json=payload, headers=headers, stream=True)
+        # Partial index over the rows load_articles selects
+        cursor.execute("DROP INDEX IF EXISTS idx_news_unprocessed")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_news_pending_extraction ON news(Title) WHERE processed_at IS NULL")
 
-        extracted_text = ""
-        accumulated_chunks = []
+        # LLM responses keyed by the hash of prompt version + article text
+        cursor.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, response TEXT)")
 
-        if response.status_code == 200:
-            # Process each streamed line
-            for line in response.iter_lines():
-                if line:
-                    decoded_line = line.decode("utf-8").strip()
-                    
-                    # Ignore stream control messages like "[DONE]"
-                    if decoded_line == "data: [DONE]":
-                        break
-                    
-                    # Remove the "data: " prefix if present
-                    if decoded_line.startswith("data: "):
-                        decoded_line = decoded_line[len("data: "):]
+        # Articles without text are never sent; drop any answer made up for empty text and
+        # reopen rows stamped from one, so they are processed once their text has been scraped
+        cursor.execute("DELETE FROM llm_cache WHERE key = ?", (hashlib.sha256(self.PROMPT_VER.encode()).hexdigest(),))
+        cursor.execute("UPDATE news SET processed_at = NULL WHERE processed_at IS NOT NULL AND (article IS NULL OR article = '')")
 
-                    try:
-                        json_line = json.loads(decoded_line)
+        # Jobs submitted to the batch API
+        cursor.execute("CREATE TABLE IF NOT EXISTS batches (id TEXT PRIMARY KEY, status TEXT, created_at INTEGER)")
+        # The news rows each batch covers; rows in an unfinished batch are not sent again
+        cursor.execute("CREATE TABLE IF NOT EXISTS batch_items (news_rowid INTEGER PRIMARY KEY, batch_id TEXT)")
+        self.conn.commit()
 
-                        # Extract delta content
-                        if "choices" in json_line and json_line["choices"]:
-                            delta = json_line["choices"][0].get("delta", {})
-                            content = delta.get("content", "")
+    @retry(
+        wait=_wait_retry_after,
+        stop=stop_after_attempt(5),
+        retry=retry_if_exception_type(TransientError),
+        reraise=True
+    )
+    async def _call_llm_async(self, session: aiohttp.ClientSession, article_text: str) -> ArticleExtractionResponse:
+        """
+        Call the Corcel API with the GPT-4o model and return the parsed extraction response.
+        The article text is clipped to MAX_CHARS characters before sending (see _build_payload).
+        429/5xx responses raise TransientError and are retried up to 5 attempts with exponential
+        backoff (or the server's Retry-After); other failures raise PermanentError immediately.
+        """
+        payload = self._build_payload(article_text)
 
-                            # Accumulate JSON chunks
-                            accumulated_chunks.append(content)
+        headers = {"Authorization": f"Bearer {next(self._api_key_cycle)}"}
+        async with session.post(self.api_url, json=payload, headers=headers) as response:
+            if response.status in TRANSIENT_STATUSES:
+                retry_after = response.headers.get("Retry-After", "")
+                raise TransientError(
+                    f"🔥 API error: {response.status}, {await response.text()}",
+                    retry_after=int(retry_after) if retry_after.isdigit() else None
+                )
+            if response.status != 200:
+                raise PermanentError(f"🔥 API error: {response.status}, {await response.text()}")
+            data = orjson.loads(await response.read())
 
-                    except json.JSONDecodeError as e:
-                        print("⚠ JSON decode error:", e, "for line:", decoded_line)
-                        continue
+        return self._parse_extraction(data["choices"][0]["message"]["content"])
 
-        else:
-            raise Exception(f"🔥 API error: {response.status_code}, {response.text}")
+    def _build_payload(self, article_text: str) -> dict:
+        """
+        Build the chat completion request body for one article, clipped to MAX_CHARS characters.
+        """
+        return {
+            **self._payload_template,
+            "messages": [
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": (article_text or "")[:self.MAX_CHARS]},
+            ],
+        }
 
-        # Join accumulated JSON chunks to form a complete JSON string
-        extracted_text = "".join(accumulated_chunks).strip()
+    def _parse_extraction(self, content: str) -> ArticleExtractionResponse:
+        """
+        Parse the model's message content (optionally fenced as markdown) into an extraction response.
+        A main_category outside ALLOWED_CATS is replaced with FALLBACK_CATEGORY.
+        """
+        extracted_text = (content or "").strip()
 
         # Remove markdown code fences if present
         if extracted_text.startswith("```"):
@@ -186,59 +253,320 @@ class ArticleExtractor:
 
         # Try parsing the full JSON at once
         try:
-            parsed_response = json.loads(extracted_text)
-            extraction = ArticleExtractionResponse(**parsed_response)
-            return extraction
+            extraction = msgspec.json.decode(extracted_text.encode(), type=ArticleExtractionResponse)
         except Exception as e:
             raise Exception(f"⚠ Failed to parse LLM response: {str(e)}. Extracted text: {extracted_text}")
 
-    def process_articles(self):
+        # Enforce the category list locally instead of re-prompting
+        if extraction.main_category not in self.ALLOWED_CATS:
+            print(f"⚠ Unknown main category '{extraction.main_category}', using '{self.FALLBACK_CATEGORY}'")
+            extraction.main_category = self.FALLBACK_CATEGORY
+        return extraction
+
+    async def _process_one(self, semaphore: asyncio.Semaphore, session: aiohttp.ClientSession,
+                           queue: asyncio.Queue, row: sqlite3.Row):
         """
-        Extract information from articles and update the database.
+        Extract information from a single article and hand the resulting row update to the writer queue.
+        Answers already in llm_cache for the same article text and PROMPT_VER skip the API call.
         """
-        articles = self.load_articles()
+        article_title = row["Title"]
+        article_rowid = row["rowid"]
+        article_text = row["article"]
+        if not article_text:
+            print(f"⚠ Skipping '{article_title}': no article text yet")
+            return
+        cache_key = hashlib.sha256((self.PROMPT_VER + article_text).encode()).hexdigest()
+
+        try:
+            cached = self.conn.execute("SELECT response FROM llm_cache WHERE key = ?", (cache_key,)).fetchone()
+            if cached:
+                extraction = msgspec.json.decode(cached["response"].encode(), type=ArticleExtractionResponse)
+                cache_row = None
+            else:
+                async with semaphore:
+                    extraction = await self._call_llm_async(session, article_text)
+                cache_row = (cache_key, msgspec.json.encode(extraction).decode())
+
+            await queue.put((
+                (orjson.dumps(extraction.keywords).decode(), extraction.main_category, orjson.dumps(extraction.subcategories).decode(), extraction.summary, article_rowid),
+                cache_row
+            ))
+            print(f"✅ Processed article: {article_title}" + (" (cached)" if cached else ""))
+        except Exception as e:
+            print(f"❌ Error processing '{article_title}': {e}")
+
+    async def _produce_all(self, semaphore: asyncio.Semaphore, session: aiohttp.ClientSession,
+                           queue: asyncio.Queue, rows):
+        """
+        Run max_concurrency producers that each pull the next article from the shared rows
+        iterator when free, so rows are read lazily and the first request goes out immediately;
+        then signal the writer with a None sentinel.
+        """
+        rows = iter(rows)
+
+        async def worker():
+            for row in rows:
+                await self._process_one(semaphore, session, queue, row)
+
+        try:
+            await asyncio.gather(*[worker() for _ in range(self.max_concurrency)])
+        finally:
+            await queue.put(None)
+
+    async def _write_results(self, queue: asyncio.Queue):
+        """
+        Single writer: drain (row update, cache entry) items from the queue into batched
+        transactions of batch_size rows until the None sentinel arrives.
+        """
+        while True:
+            item = await queue.get()
+            try:
+                if item is None:
+                    self._flush_pending()
+                    return
+                update_row, cache_row = item
+                self._pending.append(update_row)
+                if cache_row is not None:
+                    self._pending_cache.append(cache_row)
+                if len(self._pending) >= self.batch_size:
+                    self._flush_pending()
+            finally:
+                queue.task_done()
+
+    def _flush_pending(self):
+        """
+        Write all buffered extraction results and cache entries with one executemany each, inside one transaction.
+        """
+        if not self._pending and not self._pending_cache:
+            return
         cursor = self.conn.cursor()
+        cursor.execute("BEGIN")
+        try:
+            cursor.executemany(
+                """
+                UPDATE news
+                SET keywords = ?, main_category = ?, subcategories = ?, summary = ?,
+                    processed_at = strftime('%s', 'now')
+                WHERE rowid = ?
+                """,
+                self._pending
+            )
+            cursor.executemany("INSERT OR REPLACE INTO llm_cache (key, response) VALUES (?, ?)", self._pending_cache)
+            self.conn.commit()
+        except Exception:
+            # Leave no open transaction behind, so a later flush can BEGIN again; the rows stay buffered.
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            raise
+        self._pending = []
+        self._pending_cache = []
+
+    async def process_articles_async(self, rows=None):
+        """
+        Extract information from all pending articles concurrently (at most max_concurrency
+        LLM calls in flight) and update the database.
+        Extractors are producers on a bounded queue; a single writer turns the results into batched transactions.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        queue = asyncio.Queue(maxsize=200)
+        timeout = aiohttp.ClientTimeout(total=600)
+        # Keep-alive pool sized to the concurrency; the Authorization header is set per call to rotate API keys.
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60)
+        headers = {"Content-Type": "application/json"}
+        async with aiohttp.ClientSession(connector=connector, headers=headers, timeout=timeout) as session:
+            await asyncio.gather(
+                self._write_results(queue),
+                self._produce_all(semaphore, session, queue, self.load_articles() if rows is None else rows)
+            )
+
+    def process_articles(self, rows=None):
+        """
+        Extract information from articles and update the database.
+        rows defaults to all unprocessed articles (see load_articles).
+        """
+        try:
+            asyncio.run(self.process_articles_async(rows))
+        finally:
+            self._flush_pending()
+
+    def process_articles_parallel(self, workers: Optional[int] = None):
+        """
+        Split the unprocessed articles into one shard per worker process (by rowid modulo the
+        worker count), so response parsing is not limited to one core. Each worker lazily reads
+        its own shard and runs its own event loop and SQLite connection (WAL lets them commit
+        their batches in turn); max_concurrency is divided between them.
+        """
+        if self.load_articles().fetchone() is None:
+            print("✅ No unprocessed articles")
+            return
+        # At least one request in flight per worker, so never more workers than max_concurrency.
+        workers = min(workers or os.cpu_count() or 1, self.max_concurrency)
+        per_worker = self.max_concurrency // workers
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            # Start each worker at a different key so the shards do not all hit the same one first.
+            keys = [self.api_keys[i % len(self.api_keys):] + self.api_keys[:i % len(self.api_keys)] for i in range(workers)]
+            for shard in ex.map(_process_shard, [self.db_path] * workers, keys, [per_worker] * workers,
+                                [self.batch_size] * workers, range(workers), [workers] * workers):
+                print(f"✅ Finished shard {shard + 1}/{workers}")
 
-        for row in articles:
-            article_title = row["Title"]
-            article_text = row["article"]
+    def submit_batch(self, batch_path: str = "batch.jsonl") -> Optional[str]:
+        """
+        Submit all pending articles as one asynchronous job to the OpenAI-compatible batch API
+        (half the price of synchronous calls, no per-minute rate limits, results within 24h).
+        Writes one request per article to batch_path, uploads it, records the job and its rows in the
+        'batches' and 'batch_items' tables and returns the batch id for poll_batch(),
+        or None if there is nothing to submit.
+        """
+        rows = self.load_articles()
+        first = rows.fetchone()
+        if first is None:
+            print("✅ No unprocessed articles to submit")
+            return None
+
+        rowids = []
+        with open(batch_path, "wb") as f:
+            for row in itertools.chain([first], rows):
+                rowids.append(row["rowid"])
+                f.write(orjson.dumps({
+                    "custom_id": str(row["rowid"]),
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": self._build_payload(row["article"]),
+                }) + b"\n")
+
+        http = self._batch_http()
+        with open(batch_path, "rb") as f:
+            response = http.post(f"{self.api_base}/files", data={"purpose": "batch"}, files={"file": f})
+        if response.status_code != 200:
+            raise PermanentError(f"🔥 File upload error: {response.status_code}, {response.text}")
+        input_file_id = response.json()["id"]
+
+        response = http.post(f"{self.api_base}/batches", json={
+            "input_file_id": input_file_id,
+            "endpoint": "/v1/chat/completions",
+            "completion_window": "24h",
+        })
+        if response.status_code != 200:
+            raise PermanentError(f"🔥 Batch creation error: {response.status_code}, {response.text}")
+        batch = response.json()
 
+        with self.conn:
+            self.conn.execute("BEGIN")
+            self.conn.execute(
+                "INSERT OR REPLACE INTO batches (id, status, created_at) VALUES (?, ?, strftime('%s', 'now'))",
+                (batch["id"], batch["status"])
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO batch_items (news_rowid, batch_id) VALUES (?, ?)",
+                [(rowid, batch["id"]) for rowid in rowids]
+            )
+        print(f"📦 Submitted batch {batch['id']} ({batch['status']}, {len(rowids)} articles)")
+        return batch["id"]
+
+    def poll_batch(self, batch_id: str) -> str:
+        """
+        Check a submitted batch; once it is completed, download its output and apply all
+        extractions to the 'news' table in one batched transaction. Returns the batch status.
+        """
+        http = self._batch_http()
+        response = http.get(f"{self.api_base}/batches/{batch_id}")
+        if response.status_code != 200:
+            raise PermanentError(f"🔥 Batch status error: {response.status_code}, {response.text}")
+        batch = response.json()
+        status = batch["status"]
+        self.conn.execute("UPDATE batches SET status = ? WHERE id = ?", (status, batch_id))
+        if status != "completed":
+            print(f"⏳ Batch {batch_id} is {status}")
+            return status
+
+        response = http.get(f"{self.api_base}/files/{batch['output_file_id']}/content")
+        if response.status_code != 200:
+            raise PermanentError(f"🔥 Batch output error: {response.status_code}, {response.text}")
+        for line in response.content.splitlines():
+            if not line.strip():
+                continue
+            result = orjson.loads(line)
+            article_rowid = int(result["custom_id"])
             try:
-                extraction = self._call_llm(article_text)
-                
-                cursor.execute(
-                    """
-                    UPDATE news
-                    SET keywords = ?, main_category = ?, subcategories = ?, summary = ?
-                    WHERE Title = ?
-                    """,
-                    (json.dumps(extraction.keywords), extraction.main_category, json.dumps(extraction.subcategories), extraction.summary, article_title)
+                body = result["response"]["body"]
+                extraction = self._parse_extraction(body["choices"][0]["message"]["content"])
+                self._pending.append(
+                    (orjson.dumps(extraction.keywords).decode(), extraction.main_category, orjson.dumps(extraction.subcategories).decode(), extraction.summary, article_rowid)
                 )
-                self.conn.commit()
-                print(f"✅ Processed article: {article_title}")
             except Exception as e:
-                print(f"❌ Error processing '{article_title}': {e}")
+                print(f"❌ Error processing article #{article_rowid}: {e}")
+        self._flush_pending()
+        print(f"✅ Applied batch {batch_id}")
+        return status
 
-    def load_articles(self):
-        """Load articles missing extracted data."""
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT Title, article FROM news 
-            WHERE summary IS NULL OR keywords IS NULL OR main_category IS NULL OR subcategories IS NULL
-        """)
-        return cursor.fetchall()
+    def _batch_http(self) -> requests.Session:
+        """A requests session carrying the Corcel auth header, for the batch/file endpoints."""
+        http = requests.Session()
+        http.headers.update({"Authorization": f"Bearer {self.corcel_api_key}"})
+        return http
+
+    def load_articles(self, shard: Optional[tuple] = None):
+        """
+        Return a cursor over articles missing extracted data; rows are fetched lazily as it is iterated.
+        Articles without text (not scraped yet) and articles covered by a batch that has not
+        finished yet (see submit_batch) are left out.
+        shard=(index, count) restricts the rows to those with rowid % count == index.
+        """
+        query = """
+            SELECT rowid, Title, article FROM news 
+            WHERE processed_at IS NULL AND article IS NOT NULL AND article != ''
+              AND rowid NOT IN (
+                  SELECT batch_items.news_rowid FROM batch_items
+                  JOIN batches ON batches.id = batch_items.batch_id
+                  WHERE batches.status NOT IN (?, ?, ?, ?)
+              )
+        """
+        params = self.BATCH_FINISHED_STATUSES
+        if shard:
+            shard_index, shard_count = shard
+            query += " AND rowid % ? = ?"
+            params += (shard_count, shard_index)
+        cursor = self._read_conn.cursor()
+        cursor.arraysize = 64
+        cursor.execute(query, params)
+        return cursor
 
     def close(self):
-        """Close the database connection."""
+        """Flush any buffered results and close the database connections."""
+        self._flush_pending()
+        self._read_conn.close()
         self.conn.close()
 
+def _process_shard(db_path, corcel_api_keys, max_concurrency, batch_size, shard_index, shard_count):
+    """
+    Process one shard of the unprocessed articles in a worker process, with its own ArticleExtractor,
+    SQLite connection and event loop. Returns the shard index.
+    """
+    extractor = ArticleExtractor(db_path=db_path, corcel_api_key=corcel_api_keys,
+                                 max_concurrency=max_concurrency, batch_size=batch_size)
+    try:
+        extractor.process_articles(extractor.load_articles(shard=(shard_index, shard_count)))
+    finally:
+        extractor.close()
+    return shard_index
+
 # --- Example Usage ---
 if __name__ == "__main__":
     DB_PATH = "news.db"
-    CORCEL_API_KEY = "fd0e2098-520e-476d-b62e-f14bdeb6fd5d"
+    try:
+        from dotenv import load_dotenv  # optional: read the keys from a local .env file
+        load_dotenv()
+    except ImportError:
+        pass
+    # A single CORCEL_API_KEY, or several comma-separated in CORCEL_API_KEYS to multiply the rate limit.
+    CORCEL_API_KEYS = [key.strip() for key in
+                       (os.environ.get("CORCEL_API_KEYS") or os.environ.get("CORCEL_API_KEY") or "").split(",")
+                       if key.strip()]
+    if not CORCEL_API_KEYS:
+        sys.exit("CORCEL_API_KEY (or CORCEL_API_KEYS) not set")
 
-    extractor = ArticleExtractor(db_path=DB_PATH, corcel_api_key=CORCEL_API_KEY)
+    extractor = ArticleExtractor(db_path=DB_PATH, corcel_api_key=CORCEL_API_KEYS)
     try:
-        extractor.process_articles()
+        extractor.process_articles_parallel()
     finally:
         extractor.close()